@@ -1,151 +1,123 @@
 #!/usr/bin/env python3
 import asyncio
+import contextlib
+import json
 import os
+import signal
 import sys
 import time
 from aiohttp import web
 
-from sqlglot import parse, expressions
 from tansive.skillset_sdk import SkillSetClient
 
+from validator import process, warm_up
 
-def extract_sql_info_multi(sql: str) -> list:
-    try:
-        statements = parse(sql)
-        result = []
-
-        for stmt in statements:
-            stmt_type = stmt.key.upper()
-            # Find CTE names in this statement
-            cte_names = set()
-            if hasattr(stmt, "ctes") and stmt.ctes:
-                for cte in stmt.ctes:
-                    if hasattr(cte, "alias_or_name"):
-                        cte_names.add(str(cte.alias_or_name))
-                    elif hasattr(cte, "this") and hasattr(cte.this, "name"):
-                        cte_names.add(str(cte.this.name))
-            tables = {table.name for table in stmt.find_all(expressions.Table)}
-            result.append(
-                {"type": stmt_type, "tables": sorted(tables), "ctes": sorted(cte_names)}
-            )
-
-        return result
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
+# serviceEndpoint comes with each request, so clients are kept per socket path.
+# The path is caller-supplied, so the cache is capped and evicts the oldest.
+SKILL_CLIENTS = web.AppKey("skill_clients", dict)
+MAX_SKILL_CLIENTS = 16
+
+
+def get_skill_client(app, socket_path):
+    clients = app[SKILL_CLIENTS]
+    client = clients.get(socket_path)
+    if client is None:
+        if len(clients) >= MAX_SKILL_CLIENTS:
+            # SkillSetClient holds no open connection, so dropping it is enough
+            del clients[next(iter(clients))]
+        client = SkillSetClient(
+            socket_path, dial_timeout=10.0, max_retries=3, retry_delay=0.1
+        )
+        clients[socket_path] = client
+    return client
+
+
+# Request timings are aggregated as name -> [count, total_ms, max_ms] and
+# written out periodically rather than on every request.
+TIMING_FLUSH_INTERVAL = 60.0
+_timings = {}
+
+
+def record_timing(name, elapsed):
+    ms = elapsed * 1000
+    stat = _timings.get(name)
+    if stat is None:
+        _timings[name] = [1, ms, ms]
+        return
+    stat[0] += 1
+    stat[1] += ms
+    if ms > stat[2]:
+        stat[2] = ms
+
+
+def flush_timings():
+    for name, (count, total, peak) in sorted(_timings.items()):
+        print(
+            "[timing] %s: n=%d avg=%.2f ms max=%.2f ms"
+            % (name, count, total / count, peak),
+            file=sys.stderr,
+        )
+    _timings.clear()
 
-    except Exception as e:
-        return [{"type": None, "tables": [], "ctes": [], "error": str(e)}]
-
-
-def normalize_table_name(table):
-    # Remove schema and lower-case, strip quotes
-    return table.lower().split(".")[-1].strip('"')
-
-
-def process(input_args):
-    sql = input_args.get("sql")
-    if not sql:
-        return {"allowed": False, "reason": "No SQL provided"}
-
-    # Get sql-permissions from the context (injected in main)
-    sql_permissions = input_args.get("sql_permissions")
-    if sql_permissions is None:
-        return {"allowed": False, "reason": "No sql-permissions context provided"}
-
-    allow = sql_permissions.get("allow", {})
-    deny = sql_permissions.get("deny", {})
-
-    stmts = extract_sql_info_multi(sql)
-    details = []
-    denied = False
-    deny_reason = None
-
-    for stmt in stmts:
-        stmt_type = stmt.get("type")
-        tables = stmt.get("tables", [])
-        ctes = set(stmt.get("ctes", []))
-        if stmt_type is None:
-            # Handle parse error for this statement
-            stmt_detail = {
-                "type": None,
-                "tables": tables,
-                "ctes": list(ctes),
-                "allowed": False,
-                "denied": True,
-                "reason": stmt.get("error", "SQL parse error"),
-            }
-            details.append(stmt_detail)
-            denied = True
-            deny_reason = stmt_detail["reason"]
-            continue
-        stmt_detail = {
-            "type": stmt_type,
-            "tables": tables,
-            "ctes": list(ctes),
-            "allowed": True,
-            "denied": False,
-            "reason": None,
-        }
-
-        # Only check real tables (not CTEs)
-        real_tables = [t for t in tables if t not in ctes]
-
-        # Check deny first (deny takes precedence)
-        for deny_action, deny_tables in deny.items():
-            if deny_action == "all" or deny_action.lower() == (stmt_type or "").lower():
-                deny_tables_normalized = {normalize_table_name(t) for t in deny_tables}
-                for table in real_tables:
-                    table_normalized = normalize_table_name(table)
-                    if table_normalized in deny_tables_normalized:
-                        stmt_detail["allowed"] = False
-                        stmt_detail["denied"] = True
-                        stmt_detail["reason"] = (
-                            f"Denied by deny.{deny_action} for table {table}"
-                        )
-                        denied = True
-                        deny_reason = stmt_detail["reason"]
-        # Only check allow if not denied
-        if not stmt_detail["denied"]:
-            allowed_tables = allow.get(stmt_type.lower(), [])
-            allowed_tables_all = allow.get("all", [])
-            allowed_tables_normalized = {
-                normalize_table_name(t) for t in allowed_tables
-            } | {normalize_table_name(t) for t in allowed_tables_all}
-            for table in real_tables:
-                table_normalized = normalize_table_name(table)
-                if table_normalized not in allowed_tables_normalized:
-                    stmt_detail["allowed"] = False
-                    stmt_detail["reason"] = f"Table {table} not allowed for {stmt_type}"
-                    denied = True
-                    deny_reason = stmt_detail["reason"]
-        details.append(stmt_detail)
-
-    return {
-        "allowed": not denied,
-        "details": details,
-        "reason": deny_reason if denied else "All statements allowed",
-    }
+
+async def timing_reporter(app):
+    async def report():
+        while True:
+            await asyncio.sleep(TIMING_FLUSH_INTERVAL)
+            flush_timings()
+
+    task = asyncio.create_task(report())
+    yield
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    flush_timings()
+
+
+# Optional file of common queries, one per line, parsed before serving so the
+# first requests hit the parse cache.
+WARMUP_QUERIES_ENV = "SQLCHECKER_WARMUP_FILE"
+
+
+def load_warmup_queries():
+    path = os.environ.get(WARMUP_QUERIES_ENV)
+    if not path:
+        return []
+    try:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"Skipping warm-up queries from {path}: {e}", file=sys.stderr)
+        return []
 
 
 # HTTP handler
 async def handle_post(request):
     start_time = time.perf_counter()
     try:
-        args = await request.json()
+        args = json_loads(await request.read())
         session_id = args.get("sessionID")
         invocation_id = args.get("invocationID")
         socket_path = args.get("serviceEndpoint")
         input_args = args.get("inputArgs", {})
 
-        client = SkillSetClient(
-            socket_path, dial_timeout=10.0, max_retries=3, retry_delay=0.1
-        )
+        client = get_skill_client(request.app, socket_path)
 
         t0 = time.perf_counter()
-        sql_permissions = client.get_context(
-            session_id, invocation_id, "sql-permissions"
+        # SkillSetClient is blocking; keep the socket round-trip off the loop
+        sql_permissions = await asyncio.to_thread(
+            client.get_context, session_id, invocation_id, "sql-permissions"
         )
-        t1 = time.perf_counter()
-
-        print(f"[timing] skill fetch: {(t1 - t0) * 1000:.2f} ms", file=sys.stderr)
+        record_timing("skill fetch", time.perf_counter() - t0)
 
         if not isinstance(sql_permissions, dict):
             raise ValueError("sql_permissions context is not a dict")
@@ -154,39 +126,41 @@ async def handle_post(request):
 
         result = process(input_args)
 
-        end_time = time.perf_counter()
-        print(
-            f"[timing] total request: {(end_time - start_time) * 1000:.2f} ms",
-            file=sys.stderr,
-        )
+        record_timing("total request", time.perf_counter() - start_time)
 
-        return web.json_response(result)
+        return web.Response(body=json_dumps(result), content_type="application/json")
 
     except Exception as e:
-        end_time = time.perf_counter()
-        print(
-            f"[timing] total request (error): {(end_time - start_time) * 1000:.2f} ms",
-            file=sys.stderr,
-        )
+        record_timing("total request (error)", time.perf_counter() - start_time)
         return web.json_response({"error": str(e)}, status=500)
 
 
 # Launch server on UDS
 async def main():
     sock_path = "/tmp/sqlchecker.sock"
+    warm_up(load_warmup_queries())
     if os.path.exists(sock_path):
         os.remove(sock_path)
 
     app = web.Application()
+    app[SKILL_CLIENTS] = {}
+    app.cleanup_ctx.append(timing_reporter)
     app.router.add_post("/", handle_post)
 
+    # Stop on SIGTERM as well as on cancellation (Ctrl-C), so cleanup_ctx
+    # exits run and the final timings get flushed
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.UnixSite(runner, sock_path)
-    await site.start()
-    print(f"Listening on UDS {sock_path}...")
-    while True:
-        await asyncio.sleep(3600)
+    try:
+        site = web.UnixSite(runner, sock_path)
+        await site.start()
+        print(f"Listening on UDS {sock_path}...")
+        await stop.wait()
+    finally:
+        await runner.cleanup()
 
 
 if __name__ == "__main__":
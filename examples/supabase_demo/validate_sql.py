@@ -1,70 +1,359 @@
 #!/usr/bin/env python3
+import functools
 import sys
 import json
+import re
+from typing import Any, Iterable, Mapping, NamedTuple, Optional
 
-from sqlglot import parse, expressions
+from sqlglot import Dialect, expressions
 from tansive.skillset_sdk import SkillSetClient
 
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
 
-def extract_sql_info_multi(sql: str) -> list:
-    try:
-        statements = parse(sql)
-        result = []
-
-        for stmt in statements:
-            stmt_type = stmt.key.upper()
-            # Find CTE names in this statement
-            cte_names = set()
-            if hasattr(stmt, "ctes") and stmt.ctes:
-                for cte in stmt.ctes:
-                    if hasattr(cte, "alias_or_name"):
-                        cte_names.add(str(cte.alias_or_name))
-                    elif hasattr(cte, "this") and hasattr(cte.this, "name"):
-                        cte_names.add(str(cte.this.name))
-            tables = {table.name for table in stmt.find_all(expressions.Table)}
-            result.append(
-                {"type": stmt_type, "tables": sorted(tables), "ctes": sorted(cte_names)}
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
+# String and numeric literals. Quoted identifiers are captured so they can be
+# kept as-is rather than having quotes or digits inside them rewritten.
+_LIT_RE = re.compile(r"(\"(?:[^\"]|\"\")*\")|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _placeholder(m: "re.Match[str]") -> str:
+    # An empty string or zero stays valid where a literal is cast or typed
+    # ('...'::date, date '...', E'...'), unlike a bare "?".
+    if m.group(1):
+        return m.group(1)
+    return "''" if m.group(0)[0] == "'" else "0"
+
+
+def _canonicalize(sql: str) -> str:
+    # Replace literals with placeholders so statements that only differ in
+    # their constants share a cache entry. Comments, backslash escapes and
+    # dollar quoting need a real lexer, so leave those statements untouched.
+    if len(sql) < 64 or "--" in sql or "/*" in sql or "\\" in sql or "$" in sql:
+        return sql
+    return _LIT_RE.sub(_placeholder, sql)
+
+
+# The validated SQL targets Postgres (Supabase); resolve the dialect once
+# rather than on every parse call.
+_DIALECT = Dialect.get_or_raise("postgres")
+
+# Fast path for plain statements such as "SELECT ... FROM a JOIN b ON ...".
+# The whole statement must match a small grammar: a select list of columns,
+# one table followed by joins with ON conditions, and WHERE/GROUP BY/HAVING/
+# ORDER BY/LIMIT clauses over comparisons of columns and placeholders (plus
+# the UPDATE/DELETE/INSERT ... SELECT equivalents). Anything else, including
+# incomplete statements, subqueries, functions, casts, quoted identifiers,
+# comments and multiple statements, goes through sqlglot.
+_GRAMMAR_KEYWORDS = (
+    "select|from|where|join|on|and|or|not|is|null|true|false|like|ilike|as|"
+    "group|by|having|order|limit|offset|asc|desc|inner|left|right|full|outer|"
+    "cross|natural|set|returning|using|update|delete|insert|into|distinct"
+)
+_ID = rf"(?!(?:{_GRAMMAR_KEYWORDS})\b)[A-Za-z_]\w*"
+_NAME = rf"{_ID}(?:\.{_ID}){{0,2}}"
+_OPERAND = rf"(?:{_NAME}|\d+(?:\.\d+)?|''|\?|null|true|false)"
+_EXPR = rf"{_OPERAND}(?:\s*[-+*%]\s*{_OPERAND})*"
+_NOT = r"(?:not\s+)?"
+_PREDICATE = (
+    rf"{_EXPR}\s*(?:=|<>|!=|<=|>=|<|>)\s*{_EXPR}"
+    rf"|{_EXPR}\s+is\s+{_NOT}null"
+    rf"|{_EXPR}\s+{_NOT}i?like\s+{_EXPR}"
+)
+_COND = rf"{_NOT}(?:{_PREDICATE})(?:\s+(?:and|or)\s+{_NOT}(?:{_PREDICATE}))*"
+_ITEM = rf"(?:\*|{_ID}\.\*|{_EXPR}(?:\s+(?:as\s+)?{_ID})?)"
+_ITEMS = rf"{_ITEM}(?:\s*,\s*{_ITEM})*"
+_TABLE = rf"{_NAME}(?:\s+(?:as\s+)?{_ID})?"
+_JOIN = (
+    rf"\s+(?:(?:(?:left|right|full)(?:\s+outer)?|inner)\s+)?join\s+{_TABLE}"
+    rf"\s+on\s+{_COND}|\s+(?:natural|cross)\s+join\s+{_TABLE}"
+)
+_FROM = rf"{_TABLE}(?:{_JOIN})*"
+_SELECT = (
+    rf"select\s+(?:distinct\s+)?{_ITEMS}\s+from\s+{_FROM}"
+    rf"(?:\s+where\s+{_COND})?"
+    rf"(?:\s+group\s+by\s+{_EXPR}(?:\s*,\s*{_EXPR})*)?"
+    rf"(?:\s+having\s+{_COND})?"
+    rf"(?:\s+order\s+by\s+{_EXPR}(?:\s+(?:asc|desc))?"
+    rf"(?:\s*,\s*{_EXPR}(?:\s+(?:asc|desc))?)*)?"
+    rf"(?:\s+limit\s+{_OPERAND})?(?:\s+offset\s+{_OPERAND})?"
+)
+_RETURNING = rf"(?:\s+returning\s+{_ITEMS})?"
+_ASSIGN = rf"{_NAME}\s*=\s*{_EXPR}"
+_FAST_SQL_RE = re.compile(
+    rf"\s*(?:{_SELECT}"
+    rf"|update\s+{_TABLE}\s+set\s+{_ASSIGN}(?:\s*,\s*{_ASSIGN})*"
+    rf"(?:\s+from\s+{_FROM})?(?:\s+where\s+{_COND})?{_RETURNING}"
+    rf"|delete\s+from\s+{_TABLE}(?:\s+using\s+{_FROM})?"
+    rf"(?:\s+where\s+{_COND})?{_RETURNING}"
+    rf"|insert\s+into\s+{_NAME}(?:\s+as\s+{_ID})?\s+{_SELECT}{_RETURNING}"
+    rf")\s*;?\s*",
+    re.I,
+)
+# Words sqlglot treats as keywords cannot be told apart from identifiers by the
+# grammar, so statements using any of them outside a grammar position go
+# through sqlglot too. The extra words are ones sqlglot understands in some
+# dialect even though Postgres does not reserve them.
+_FAST_RESERVED = frozenset(
+    word.lower()
+    for keyword in _DIALECT.tokenizer_class.KEYWORDS
+    for word in keyword.split()
+    if re.fullmatch(r"[A-Za-z_]\w*", word)
+)
+_FAST_RESERVED = _FAST_RESERVED.union(
+    ("straight_join", "apply", "positional", "tablesample", "fetch", "only")
+).difference(_GRAMMAR_KEYWORDS.split("|"))
+_WORD_RE = re.compile(r"[A-Za-z_]\w*")
+_FAST_RE = re.compile(r"\b(?:from|join|into|update|using)\s+([A-Za-z_][\w.]*)", re.I)
+
+
+def _fast_extract(
+    sql: str,
+) -> Optional[tuple[str, frozenset[str], frozenset[str], frozenset[str]]]:
+    if not _FAST_SQL_RE.fullmatch(sql):
+        return None
+    words = _WORD_RE.findall(sql)
+    if not _FAST_RESERVED.isdisjoint(word.lower() for word in words):
+        return None
+    # The grammar only allows these keywords directly before a table name
+    names = _FAST_RE.findall(sql)
+    tables = frozenset(sys.intern(name.rsplit(".", 1)[-1].lower()) for name in names)
+    # No CTEs here, so every table is a real one
+    return words[0].upper(), tables, frozenset(), tables
+
+
+def _fold_identifier(ident: Any) -> str:
+    # Postgres folds unquoted identifiers to lower case and keeps quoted ones
+    # exactly as written.
+    name: str = ident.name
+    return name if ident.quoted else name.lower()
+
+
+def _collect_names(stmt: Any) -> tuple[set[str], set[str], set[str]]:
+    # One pass over the AST collecting table names alongside the names of the
+    # statement's own CTEs (those directly under its top-level WITH clause),
+    # and the tables that are not references to one of those CTEs.
+    tables: set[str] = set()
+    cte_names: set[str] = set()
+    real_tables: set[str] = set()
+    cte_idents: set[str] = set()
+    # (folded identifier, table name) of references that may name a CTE
+    unqualified: list[tuple[str, str]] = []
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, expressions.Table):
+            # sqlglot already splits off schema/catalog and strips quotes
+            name = sys.intern(node.name.lower())
+            tables.add(name)
+            ident = node.this
+            if isinstance(ident, expressions.Identifier) and not node.args.get("db"):
+                unqualified.append((_fold_identifier(ident), name))
+            else:
+                real_tables.add(name)
+        elif isinstance(node, expressions.CTE):
+            parent = node.parent
+            if parent is not None and parent.parent is stmt:
+                cte_names.add(str(node.alias_or_name).lower())
+                alias = node.args.get("alias")
+                if alias is not None and isinstance(alias.this, expressions.Identifier):
+                    cte_idents.add(_fold_identifier(alias.this))
+        for child in node.args.values():
+            if isinstance(child, list):
+                stack.extend(c for c in child if isinstance(c, expressions.Expression))
+            elif isinstance(child, expressions.Expression):
+                stack.append(child)
+    # A reference only resolves to a CTE when the folded identifiers are equal,
+    # so "Tokens" and tokens stay distinct.
+    real_tables.update(name for ident, name in unqualified if ident not in cte_idents)
+    return tables, cte_names, real_tables
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_sql(
+    sql: str,
+) -> tuple[tuple[str, frozenset[str], frozenset[str], frozenset[str]], ...]:
+    # sqlglot expressions are mutable and unhashable, so cache the derived
+    # (type, tables, ctes, real tables) tuples rather than the AST itself.
+    fast = _fast_extract(sql)
+    if fast is not None:
+        return (fast,)
+    result: list[tuple[str, frozenset[str], frozenset[str], frozenset[str]]] = []
+    for stmt in _DIALECT.parse(sql):
+        if stmt is None:
+            raise ValueError("Empty SQL statement")
+        stmt_type = stmt.key.upper()
+        tables, cte_names, real_tables = _collect_names(stmt)
+        result.append(
+            (
+                stmt_type,
+                frozenset(tables),
+                frozenset(cte_names),
+                frozenset(real_tables),
             )
+        )
+    return tuple(result)
+
+
+# Canonical forms that failed to parse. lru_cache does not keep exceptions, so
+# without this every repeat would run the failing parse again before falling
+# back to the original text.
+_UNPARSABLE_CANONICAL: dict[str, None] = {}
+_MAX_UNPARSABLE_CANONICAL = 1024
 
-        return result
+
+def extract_sql_info_multi(sql: str) -> list[dict[str, Any]]:
+    try:
+        canonical = _canonicalize(sql)
+        if canonical in _UNPARSABLE_CANONICAL:
+            canonical = sql
+        try:
+            statements = _parse_sql(canonical)
+        except Exception:
+            if canonical == sql:
+                raise
+            # Placeholders are not valid everywhere a literal is; fall back to
+            # the original text so the result never depends on canonicalization.
+            if len(_UNPARSABLE_CANONICAL) >= _MAX_UNPARSABLE_CANONICAL:
+                del _UNPARSABLE_CANONICAL[next(iter(_UNPARSABLE_CANONICAL))]
+            _UNPARSABLE_CANONICAL[canonical] = None
+            statements = _parse_sql(sql)
+        # Sets are returned as-is; only the user-visible details get sorted
+        return [
+            {"type": stmt_type, "tables": tables, "ctes": ctes, "real_tables": real}
+            for stmt_type, tables, ctes, real in statements
+        ]
 
     except Exception as e:
-        return [{"type": None, "tables": [], "ctes": [], "error": str(e)}]
+        return [
+            {
+                "type": None,
+                "tables": frozenset(),
+                "ctes": frozenset(),
+                "real_tables": frozenset(),
+                "error": str(e),
+            }
+        ]
+
 
+def warm_up(queries: Iterable[str] = ()) -> None:
+    # The first parse pays for building sqlglot's tokenizer and parser state.
+    # "SELECT 1" would be served by the fast path, so parse it with the dialect
+    # directly, then seed the parse cache with any known query shapes.
+    _DIALECT.parse("SELECT 1")
+    for sql in queries:
+        extract_sql_info_multi(sql)
 
-def normalize_table_name(table):
+
+def normalize_table_name(table: str) -> str:
+    # Most names are already lower-case, unquoted and schema-less
+    if table.islower() and "." not in table and '"' not in table:
+        return table
     # Remove schema and lower-case, strip quotes
-    return table.lower().split(".")[-1].strip('"')
+    return table.lower().rsplit(".", 1)[-1].strip('"')
+
+
+def normalize_permissions(
+    rules: Mapping[str, Iterable[str]],
+) -> dict[str, frozenset[str]]:
+    # Map lower-cased action -> set of normalized table names. Actions that
+    # only differ in case are merged rather than overwriting each other.
+    # Names are interned like the ones taken from parsed SQL, so membership
+    # probes mostly compare by identity.
+    normalized: dict[str, set[str]] = {}
+    for action, tables in rules.items():
+        normalized.setdefault(action.lower(), set()).update(
+            sys.intern(normalize_table_name(t)) for t in tables
+        )
+    return {action: frozenset(tables) for action, tables in normalized.items()}
+
+
+# Hashable form of one permission section: sorted (action, tables) pairs
+FrozenRules = tuple[tuple[str, frozenset[str]], ...]
 
 
-def process(input_args):
-    sql = input_args.get("sql")
+class CompiledPermissions(NamedTuple):
+    deny: dict[str, frozenset[str]]
+    deny_any: dict[str, frozenset[str]]
+    deny_all: frozenset[str]
+    allow: dict[str, frozenset[str]]
+    allow_all: frozenset[str]
+
+
+def _freeze(rules: Mapping[str, Iterable[str]]) -> FrozenRules:
+    return tuple(
+        sorted(
+            ((action, frozenset(tables)) for action, tables in rules.items()),
+            key=lambda item: item[0],
+        )
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_permissions(allow: FrozenRules, deny: FrozenRules) -> CompiledPermissions:
+    # allow.all is folded into each action so one lookup covers both.
+    allow_norm = normalize_permissions(dict(allow))
+    allow_all_norm = allow_norm.get("all", frozenset())
+    allow_norm = {
+        action: tables | allow_all_norm for action, tables in allow_norm.items()
+    }
+    # deny_any holds everything deny.all and deny.<action> reject together, so
+    # a statement that touches no denied table is cleared with one probe.
+    deny_norm = normalize_permissions(dict(deny))
+    deny_all_norm = deny_norm.get("all", frozenset())
+    deny_any = {action: tables | deny_all_norm for action, tables in deny_norm.items()}
+    return CompiledPermissions(
+        deny_norm, deny_any, deny_all_norm, allow_norm, allow_all_norm
+    )
+
+
+def compile_permissions(
+    sql_permissions: Mapping[str, Mapping[str, Iterable[str]]],
+) -> CompiledPermissions:
+    # The sql-permissions context rarely changes between requests, so the
+    # normalized form is cached on its content rather than rebuilt each call.
+    return _compile_permissions(
+        _freeze(sql_permissions.get("allow", {})),
+        _freeze(sql_permissions.get("deny", {})),
+    )
+
+
+def process(input_args: dict[str, Any]) -> dict[str, Any]:
+    sql: str | None = input_args.get("sql")
     if not sql:
         return {"allowed": False, "reason": "No SQL provided"}
 
     # Get sql-permissions from the context (injected in main)
-    sql_permissions = input_args.get("sql_permissions")
+    sql_permissions: dict[str, dict[str, list[str]]] | None = input_args.get(
+        "sql_permissions"
+    )
     if sql_permissions is None:
         return {"allowed": False, "reason": "No sql-permissions context provided"}
 
-    allow = sql_permissions.get("allow", {})
-    deny = sql_permissions.get("deny", {})
+    deny_norm, deny_any, deny_all_norm, allow_norm, allow_all_norm = (
+        compile_permissions(sql_permissions)
+    )
 
     stmts = extract_sql_info_multi(sql)
-    details = []
+    details: list[dict[str, Any]] = []
     denied = False
-    deny_reason = None
+    deny_reason: str | None = None
 
     for stmt in stmts:
         stmt_type = stmt.get("type")
-        tables = stmt.get("tables", [])
-        ctes = set(stmt.get("ctes", []))
+        tables: frozenset[str] = stmt.get("tables", frozenset())
+        ctes: frozenset[str] = stmt.get("ctes", frozenset())
         if stmt_type is None:
             # Handle parse error for this statement
-            stmt_detail = {
+            stmt_detail: dict[str, Any] = {
                 "type": None,
-                "tables": tables,
-                "ctes": list(ctes),
+                "tables": sorted(tables),
+                "ctes": sorted(ctes),
                 "allowed": False,
                 "denied": True,
                 "reason": stmt.get("error", "SQL parse error"),
@@ -75,44 +364,48 @@ def process(input_args):
             continue
         stmt_detail = {
             "type": stmt_type,
-            "tables": tables,
-            "ctes": list(ctes),
+            "tables": sorted(tables),
+            "ctes": sorted(ctes),
             "allowed": True,
             "denied": False,
             "reason": None,
         }
 
-        # Only check real tables (not CTEs)
-        real_tables = [t for t in tables if t not in ctes]
-
-        # Check deny first (deny takes precedence)
-        for deny_action, deny_tables in deny.items():
-            if deny_action == "all" or deny_action.lower() == (stmt_type or "").lower():
-                deny_tables_normalized = {normalize_table_name(t) for t in deny_tables}
-                for table in real_tables:
-                    table_normalized = normalize_table_name(table)
-                    if table_normalized in deny_tables_normalized:
-                        stmt_detail["allowed"] = False
-                        stmt_detail["denied"] = True
-                        stmt_detail["reason"] = (
-                            f"Denied by deny.{deny_action} for table {table}"
-                        )
-                        denied = True
-                        deny_reason = stmt_detail["reason"]
-        # Only check allow if not denied
-        if not stmt_detail["denied"]:
-            allowed_tables = allow.get(stmt_type.lower(), [])
-            allowed_tables_all = allow.get("all", [])
-            allowed_tables_normalized = {
-                normalize_table_name(t) for t in allowed_tables
-            } | {normalize_table_name(t) for t in allowed_tables_all}
-            for table in real_tables:
-                table_normalized = normalize_table_name(table)
-                if table_normalized not in allowed_tables_normalized:
+        # Only check real tables (not CTE references)
+        real_tables: frozenset[str] = stmt.get("real_tables", frozenset())
+        stmt_type_lc = stmt_type.lower()
+
+        # Check deny first (deny takes precedence). Action keys are already
+        # lower-cased, so only deny.all and deny.<type> can apply, and both
+        # are checked at once against their union. The set operations run the
+        # whole table list through the hash set in C; the matching rule and
+        # table are only looked up once a statement is known to fail, starting
+        # with the blanket deny.all rule.
+        if not deny_any.get(stmt_type_lc, deny_all_norm).isdisjoint(real_tables):
+            for deny_action in ("all", stmt_type_lc):
+                deny_tables_normalized = deny_norm.get(deny_action)
+                if deny_tables_normalized and not deny_tables_normalized.isdisjoint(
+                    real_tables
+                ):
+                    table = min(deny_tables_normalized.intersection(real_tables))
                     stmt_detail["allowed"] = False
-                    stmt_detail["reason"] = f"Table {table} not allowed for {stmt_type}"
+                    stmt_detail["denied"] = True
+                    stmt_detail["reason"] = (
+                        f"Denied by deny.{deny_action} for table {table}"
+                    )
                     denied = True
                     deny_reason = stmt_detail["reason"]
+                    # One matching rule is enough to deny the statement
+                    break
+        # Only check allow if not denied
+        if not stmt_detail["denied"]:
+            allowed_tables_normalized = allow_norm.get(stmt_type_lc, allow_all_norm)
+            if not allowed_tables_normalized.issuperset(real_tables):
+                table = min(real_tables.difference(allowed_tables_normalized))
+                stmt_detail["allowed"] = False
+                stmt_detail["reason"] = f"Table {table} not allowed for {stmt_type}"
+                denied = True
+                deny_reason = stmt_detail["reason"]
         details.append(stmt_detail)
 
     return {
@@ -122,13 +415,58 @@ def process(input_args):
     }
 
 
+# serviceEndpoint comes with each request, so --daemon keeps clients per socket
+# path. The path is caller-supplied, so the cache is capped and evicts the
+# oldest, as in validate_sql_uds.py.
+MAX_SKILL_CLIENTS = 16
+
+
+def serve():
+    # Newline-delimited JSON requests on stdin, one JSON result per line on
+    # stdout. A caller that keeps this process around skips interpreter and
+    # sqlglot start-up on every call and lets the parse caches warm up.
+    warm_up()
+    clients = {}
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            args = json_loads(line)
+            socket_path = args.get("serviceEndpoint")
+            client = clients.get(socket_path)
+            if client is None:
+                if len(clients) >= MAX_SKILL_CLIENTS:
+                    # SkillSetClient holds no open connection, so dropping it is enough
+                    del clients[next(iter(clients))]
+                client = SkillSetClient(
+                    socket_path, dial_timeout=10.0, max_retries=3, retry_delay=0.1
+                )
+                clients[socket_path] = client
+            sql_permissions = client.get_context(
+                args.get("sessionID"), args.get("invocationID"), "sql-permissions"
+            )
+            if not isinstance(sql_permissions, dict):
+                raise ValueError("sql_permissions context is not a dict")
+            input_args = args.get("inputArgs", {})
+            input_args["sql_permissions"] = sql_permissions
+            result = process(input_args)
+        except Exception as e:
+            result = {"error": str(e)}
+        sys.stdout.buffer.write(json_dumps(result) + b"\n")
+        sys.stdout.buffer.flush()
+
+
 def main():
+    if "--daemon" in sys.argv:
+        serve()
+        return
+
     if len(sys.argv) < 2:
         print("No args provided", file=sys.stderr)
         sys.exit(1)
 
     try:
-        args = json.loads(sys.argv[1])
+        args = json_loads(sys.argv[1])
     except Exception as e:
         print(f"Failed to parse input args: {e}", file=sys.stderr)
         sys.exit(1)
@@ -158,7 +496,7 @@ def main():
 
     try:
         result = process(input_args)
-        print(json.dumps(result))
+        sys.stdout.buffer.write(json_dumps(result) + b"\n")
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(2)
@@ -243,6 +581,57 @@ if __name__ == "__main__" and "--test" in sys.argv:
             "sql": "SELECT * FROM (SELECT * FROM integration_tokens) AS it;",
             "expect": False,
         },
+        {
+            "sql": 'WITH "Integration_Tokens" AS (SELECT 1) SELECT * FROM integration_tokens;',
+            "expect": False,
+        },
+        # Regex fast path and literal canonicalization: tables must never be
+        # missed, whichever path handles the statement
+        {
+            "sql": "SELECT * FROM support_tickets, integration_tokens;",
+            "expect": False,
+        },
+        {"sql": "SELECT * FROM ONLY integration_tokens;", "expect": False},
+        {
+            "sql": "SELECT * FROM support_tickets UNION SELECT * FROM integration_tokens;",
+            "expect": False,
+        },
+        {"sql": 'SELECT * FROM "integration_tokens";', "expect": False},
+        {
+            "sql": "UPDATE support_messages SET content = 'x' FROM integration_tokens WHERE support_messages.id = integration_tokens.id;",
+            "expect": False,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets WHERE subject = 'say \"hi\" -- integration_tokens' AND status = 'open';",
+            "expect": True,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets WHERE subject = 'a -- \"b\"' UNION SELECT * FROM integration_tokens WHERE token = 'c';",
+            "expect": False,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets WHERE subject = 'FROM integration_tokens' OR status = 'x';",
+            "expect": True,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets WHERE subject = 'it''s FROM support_messages' UNION SELECT * FROM integration_tokens;",
+            "expect": False,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets NATURAL JOIN support_messages;",
+            "expect": True,
+        },
+        {
+            "sql": "SELECT * FROM support_tickets t JOIN support_messages m USING (ticket_id) WHERE t.status = 'open';",
+            "expect": True,
+        },
+        # Incomplete or malformed statements are parse errors, never allowed
+        {"sql": "SELECT * FROM support_tickets WHERE", "expect": False},
+        {"sql": "SELECT FROM support_tickets = = =", "expect": False},
+        {
+            "sql": "SELECT * FROM support_tickets WHERE x LIKE y ESCAPE z",
+            "expect": False,
+        },
     ]
     summary = []
     for idx, case in enumerate(test_cases):
@@ -258,6 +647,16 @@ if __name__ == "__main__" and "--test" in sys.argv:
         )
         print("-" * 40)
         summary.append((idx + 1, passed, expected, actual))
+    # Repeats of a query shape with typed literals must come from the cache
+    cast_sql = "SELECT * FROM support_tickets WHERE created_at > '2024-01-01'::date AND status = 'open' AND id = 42;"
+    process({"sql": cast_sql, "sql_permissions": sql_permissions})
+    misses = _parse_sql.cache_info().misses
+    process({"sql": cast_sql.replace("42", "43"), "sql_permissions": sql_permissions})
+    cached = _parse_sql.cache_info().misses == misses
+    print(f"Test {len(summary) + 1}: cache reuse for: {cast_sql}")
+    print(f"Served from parse cache: {cached} | {'✅' if cached else '❌'}")
+    print("-" * 40)
+    summary.append((len(summary) + 1, cached, True, cached))
     # Print summary
     print("\nTest Summary:")
     for idx, passed, expected, actual in summary:
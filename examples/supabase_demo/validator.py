@@ -0,0 +1,408 @@
+# Core SQL permission checks shared by the validator skill scripts.
+#
+# Kept free of I/O and fully annotated so it can be compiled with mypyc
+# (`mypyc validator.py`); Python imports the resulting extension module in
+# preference to this file when both are present.
+import functools
+import re
+import sys
+from typing import Any, Iterable, Mapping, NamedTuple, Optional
+
+from sqlglot import Dialect, expressions
+
+# String and numeric literals. Quoted identifiers are captured so they can be
+# kept as-is rather than having quotes or digits inside them rewritten.
+_LIT_RE = re.compile(r"(\"(?:[^\"]|\"\")*\")|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _placeholder(m: "re.Match[str]") -> str:
+    # An empty string or zero stays valid where a literal is cast or typed
+    # ('...'::date, date '...', E'...'), unlike a bare "?".
+    if m.group(1):
+        return m.group(1)
+    return "''" if m.group(0)[0] == "'" else "0"
+
+
+def _canonicalize(sql: str) -> str:
+    # Replace literals with placeholders so statements that only differ in
+    # their constants share a cache entry. Comments, backslash escapes and
+    # dollar quoting need a real lexer, so leave those statements untouched.
+    if len(sql) < 64 or "--" in sql or "/*" in sql or "\\" in sql or "$" in sql:
+        return sql
+    return _LIT_RE.sub(_placeholder, sql)
+
+
+# The validated SQL targets Postgres (Supabase); resolve the dialect once
+# rather than on every parse call.
+_DIALECT = Dialect.get_or_raise("postgres")
+
+# Fast path for plain statements such as "SELECT ... FROM a JOIN b ON ...".
+# The whole statement must match a small grammar: a select list of columns,
+# one table followed by joins with ON conditions, and WHERE/GROUP BY/HAVING/
+# ORDER BY/LIMIT clauses over comparisons of columns and placeholders (plus
+# the UPDATE/DELETE/INSERT ... SELECT equivalents). Anything else, including
+# incomplete statements, subqueries, functions, casts, quoted identifiers,
+# comments and multiple statements, goes through sqlglot.
+_GRAMMAR_KEYWORDS = (
+    "select|from|where|join|on|and|or|not|is|null|true|false|like|ilike|as|"
+    "group|by|having|order|limit|offset|asc|desc|inner|left|right|full|outer|"
+    "cross|natural|set|returning|using|update|delete|insert|into|distinct"
+)
+_ID = rf"(?!(?:{_GRAMMAR_KEYWORDS})\b)[A-Za-z_]\w*"
+_NAME = rf"{_ID}(?:\.{_ID}){{0,2}}"
+_OPERAND = rf"(?:{_NAME}|\d+(?:\.\d+)?|''|\?|null|true|false)"
+_EXPR = rf"{_OPERAND}(?:\s*[-+*%]\s*{_OPERAND})*"
+_NOT = r"(?:not\s+)?"
+_PREDICATE = (
+    rf"{_EXPR}\s*(?:=|<>|!=|<=|>=|<|>)\s*{_EXPR}"
+    rf"|{_EXPR}\s+is\s+{_NOT}null"
+    rf"|{_EXPR}\s+{_NOT}i?like\s+{_EXPR}"
+)
+_COND = rf"{_NOT}(?:{_PREDICATE})(?:\s+(?:and|or)\s+{_NOT}(?:{_PREDICATE}))*"
+_ITEM = rf"(?:\*|{_ID}\.\*|{_EXPR}(?:\s+(?:as\s+)?{_ID})?)"
+_ITEMS = rf"{_ITEM}(?:\s*,\s*{_ITEM})*"
+_TABLE = rf"{_NAME}(?:\s+(?:as\s+)?{_ID})?"
+_JOIN = (
+    rf"\s+(?:(?:(?:left|right|full)(?:\s+outer)?|inner)\s+)?join\s+{_TABLE}"
+    rf"\s+on\s+{_COND}|\s+(?:natural|cross)\s+join\s+{_TABLE}"
+)
+_FROM = rf"{_TABLE}(?:{_JOIN})*"
+_SELECT = (
+    rf"select\s+(?:distinct\s+)?{_ITEMS}\s+from\s+{_FROM}"
+    rf"(?:\s+where\s+{_COND})?"
+    rf"(?:\s+group\s+by\s+{_EXPR}(?:\s*,\s*{_EXPR})*)?"
+    rf"(?:\s+having\s+{_COND})?"
+    rf"(?:\s+order\s+by\s+{_EXPR}(?:\s+(?:asc|desc))?"
+    rf"(?:\s*,\s*{_EXPR}(?:\s+(?:asc|desc))?)*)?"
+    rf"(?:\s+limit\s+{_OPERAND})?(?:\s+offset\s+{_OPERAND})?"
+)
+_RETURNING = rf"(?:\s+returning\s+{_ITEMS})?"
+_ASSIGN = rf"{_NAME}\s*=\s*{_EXPR}"
+_FAST_SQL_RE = re.compile(
+    rf"\s*(?:{_SELECT}"
+    rf"|update\s+{_TABLE}\s+set\s+{_ASSIGN}(?:\s*,\s*{_ASSIGN})*"
+    rf"(?:\s+from\s+{_FROM})?(?:\s+where\s+{_COND})?{_RETURNING}"
+    rf"|delete\s+from\s+{_TABLE}(?:\s+using\s+{_FROM})?"
+    rf"(?:\s+where\s+{_COND})?{_RETURNING}"
+    rf"|insert\s+into\s+{_NAME}(?:\s+as\s+{_ID})?\s+{_SELECT}{_RETURNING}"
+    rf")\s*;?\s*",
+    re.I,
+)
+# Words sqlglot treats as keywords cannot be told apart from identifiers by the
+# grammar, so statements using any of them outside a grammar position go
+# through sqlglot too. The extra words are ones sqlglot understands in some
+# dialect even though Postgres does not reserve them.
+_FAST_RESERVED = frozenset(
+    word.lower()
+    for keyword in _DIALECT.tokenizer_class.KEYWORDS
+    for word in keyword.split()
+    if re.fullmatch(r"[A-Za-z_]\w*", word)
+)
+_FAST_RESERVED = _FAST_RESERVED.union(
+    ("straight_join", "apply", "positional", "tablesample", "fetch", "only")
+).difference(_GRAMMAR_KEYWORDS.split("|"))
+_WORD_RE = re.compile(r"[A-Za-z_]\w*")
+_FAST_RE = re.compile(r"\b(?:from|join|into|update|using)\s+([A-Za-z_][\w.]*)", re.I)
+
+
+def _fast_extract(
+    sql: str,
+) -> Optional[tuple[str, frozenset[str], frozenset[str], frozenset[str]]]:
+    if not _FAST_SQL_RE.fullmatch(sql):
+        return None
+    words = _WORD_RE.findall(sql)
+    if not _FAST_RESERVED.isdisjoint(word.lower() for word in words):
+        return None
+    # The grammar only allows these keywords directly before a table name
+    names = _FAST_RE.findall(sql)
+    tables = frozenset(sys.intern(name.rsplit(".", 1)[-1].lower()) for name in names)
+    # No CTEs here, so every table is a real one
+    return words[0].upper(), tables, frozenset(), tables
+
+
+def _fold_identifier(ident: Any) -> str:
+    # Postgres folds unquoted identifiers to lower case and keeps quoted ones
+    # exactly as written.
+    name: str = ident.name
+    return name if ident.quoted else name.lower()
+
+
+def _collect_names(stmt: Any) -> tuple[set[str], set[str], set[str]]:
+    # One pass over the AST collecting table names alongside the names of the
+    # statement's own CTEs (those directly under its top-level WITH clause),
+    # and the tables that are not references to one of those CTEs.
+    tables: set[str] = set()
+    cte_names: set[str] = set()
+    real_tables: set[str] = set()
+    cte_idents: set[str] = set()
+    # (folded identifier, table name) of references that may name a CTE
+    unqualified: list[tuple[str, str]] = []
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, expressions.Table):
+            # sqlglot already splits off schema/catalog and strips quotes
+            name = sys.intern(node.name.lower())
+            tables.add(name)
+            ident = node.this
+            if isinstance(ident, expressions.Identifier) and not node.args.get("db"):
+                unqualified.append((_fold_identifier(ident), name))
+            else:
+                real_tables.add(name)
+        elif isinstance(node, expressions.CTE):
+            parent = node.parent
+            if parent is not None and parent.parent is stmt:
+                cte_names.add(str(node.alias_or_name).lower())
+                alias = node.args.get("alias")
+                if alias is not None and isinstance(alias.this, expressions.Identifier):
+                    cte_idents.add(_fold_identifier(alias.this))
+        for child in node.args.values():
+            if isinstance(child, list):
+                stack.extend(c for c in child if isinstance(c, expressions.Expression))
+            elif isinstance(child, expressions.Expression):
+                stack.append(child)
+    # A reference only resolves to a CTE when the folded identifiers are equal,
+    # so "Tokens" and tokens stay distinct.
+    real_tables.update(name for ident, name in unqualified if ident not in cte_idents)
+    return tables, cte_names, real_tables
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_sql(
+    sql: str,
+) -> tuple[tuple[str, frozenset[str], frozenset[str], frozenset[str]], ...]:
+    # sqlglot expressions are mutable and unhashable, so cache the derived
+    # (type, tables, ctes, real tables) tuples rather than the AST itself.
+    fast = _fast_extract(sql)
+    if fast is not None:
+        return (fast,)
+    result: list[tuple[str, frozenset[str], frozenset[str], frozenset[str]]] = []
+    for stmt in _DIALECT.parse(sql):
+        if stmt is None:
+            raise ValueError("Empty SQL statement")
+        stmt_type = stmt.key.upper()
+        tables, cte_names, real_tables = _collect_names(stmt)
+        result.append(
+            (
+                stmt_type,
+                frozenset(tables),
+                frozenset(cte_names),
+                frozenset(real_tables),
+            )
+        )
+    return tuple(result)
+
+
+# Canonical forms that failed to parse. lru_cache does not keep exceptions, so
+# without this every repeat would run the failing parse again before falling
+# back to the original text.
+_UNPARSABLE_CANONICAL: dict[str, None] = {}
+_MAX_UNPARSABLE_CANONICAL = 1024
+
+
+def extract_sql_info_multi(sql: str) -> list[dict[str, Any]]:
+    try:
+        canonical = _canonicalize(sql)
+        if canonical in _UNPARSABLE_CANONICAL:
+            canonical = sql
+        try:
+            statements = _parse_sql(canonical)
+        except Exception:
+            if canonical == sql:
+                raise
+            # Placeholders are not valid everywhere a literal is; fall back to
+            # the original text so the result never depends on canonicalization.
+            if len(_UNPARSABLE_CANONICAL) >= _MAX_UNPARSABLE_CANONICAL:
+                del _UNPARSABLE_CANONICAL[next(iter(_UNPARSABLE_CANONICAL))]
+            _UNPARSABLE_CANONICAL[canonical] = None
+            statements = _parse_sql(sql)
+        # Sets are returned as-is; only the user-visible details get sorted
+        return [
+            {"type": stmt_type, "tables": tables, "ctes": ctes, "real_tables": real}
+            for stmt_type, tables, ctes, real in statements
+        ]
+
+    except Exception as e:
+        return [
+            {
+                "type": None,
+                "tables": frozenset(),
+                "ctes": frozenset(),
+                "real_tables": frozenset(),
+                "error": str(e),
+            }
+        ]
+
+
+def warm_up(queries: Iterable[str] = ()) -> None:
+    # The first parse pays for building sqlglot's tokenizer and parser state.
+    # "SELECT 1" would be served by the fast path, so parse it with the dialect
+    # directly, then seed the parse cache with any known query shapes.
+    _DIALECT.parse("SELECT 1")
+    for sql in queries:
+        extract_sql_info_multi(sql)
+
+
+def normalize_table_name(table: str) -> str:
+    # Most names are already lower-case, unquoted and schema-less
+    if table.islower() and "." not in table and '"' not in table:
+        return table
+    # Remove schema and lower-case, strip quotes
+    return table.lower().rsplit(".", 1)[-1].strip('"')
+
+
+def normalize_permissions(
+    rules: Mapping[str, Iterable[str]],
+) -> dict[str, frozenset[str]]:
+    # Map lower-cased action -> set of normalized table names. Actions that
+    # only differ in case are merged rather than overwriting each other.
+    # Names are interned like the ones taken from parsed SQL, so membership
+    # probes mostly compare by identity.
+    normalized: dict[str, set[str]] = {}
+    for action, tables in rules.items():
+        normalized.setdefault(action.lower(), set()).update(
+            sys.intern(normalize_table_name(t)) for t in tables
+        )
+    return {action: frozenset(tables) for action, tables in normalized.items()}
+
+
+# Hashable form of one permission section: sorted (action, tables) pairs
+FrozenRules = tuple[tuple[str, frozenset[str]], ...]
+
+
+class CompiledPermissions(NamedTuple):
+    deny: dict[str, frozenset[str]]
+    deny_any: dict[str, frozenset[str]]
+    deny_all: frozenset[str]
+    allow: dict[str, frozenset[str]]
+    allow_all: frozenset[str]
+
+
+def _freeze(rules: Mapping[str, Iterable[str]]) -> FrozenRules:
+    return tuple(
+        sorted(
+            ((action, frozenset(tables)) for action, tables in rules.items()),
+            key=lambda item: item[0],
+        )
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_permissions(allow: FrozenRules, deny: FrozenRules) -> CompiledPermissions:
+    # allow.all is folded into each action so one lookup covers both.
+    allow_norm = normalize_permissions(dict(allow))
+    allow_all_norm = allow_norm.get("all", frozenset())
+    allow_norm = {
+        action: tables | allow_all_norm for action, tables in allow_norm.items()
+    }
+    # deny_any holds everything deny.all and deny.<action> reject together, so
+    # a statement that touches no denied table is cleared with one probe.
+    deny_norm = normalize_permissions(dict(deny))
+    deny_all_norm = deny_norm.get("all", frozenset())
+    deny_any = {action: tables | deny_all_norm for action, tables in deny_norm.items()}
+    return CompiledPermissions(
+        deny_norm, deny_any, deny_all_norm, allow_norm, allow_all_norm
+    )
+
+
+def compile_permissions(
+    sql_permissions: Mapping[str, Mapping[str, Iterable[str]]],
+) -> CompiledPermissions:
+    # The sql-permissions context rarely changes between requests, so the
+    # normalized form is cached on its content rather than rebuilt each call.
+    return _compile_permissions(
+        _freeze(sql_permissions.get("allow", {})),
+        _freeze(sql_permissions.get("deny", {})),
+    )
+
+
+def process(input_args: dict[str, Any]) -> dict[str, Any]:
+    sql: str | None = input_args.get("sql")
+    if not sql:
+        return {"allowed": False, "reason": "No SQL provided"}
+
+    # Get sql-permissions from the context (injected in main)
+    sql_permissions: dict[str, dict[str, list[str]]] | None = input_args.get(
+        "sql_permissions"
+    )
+    if sql_permissions is None:
+        return {"allowed": False, "reason": "No sql-permissions context provided"}
+
+    deny_norm, deny_any, deny_all_norm, allow_norm, allow_all_norm = (
+        compile_permissions(sql_permissions)
+    )
+
+    stmts = extract_sql_info_multi(sql)
+    details: list[dict[str, Any]] = []
+    denied = False
+    deny_reason: str | None = None
+
+    for stmt in stmts:
+        stmt_type = stmt.get("type")
+        tables: frozenset[str] = stmt.get("tables", frozenset())
+        ctes: frozenset[str] = stmt.get("ctes", frozenset())
+        if stmt_type is None:
+            # Handle parse error for this statement
+            stmt_detail: dict[str, Any] = {
+                "type": None,
+                "tables": sorted(tables),
+                "ctes": sorted(ctes),
+                "allowed": False,
+                "denied": True,
+                "reason": stmt.get("error", "SQL parse error"),
+            }
+            details.append(stmt_detail)
+            denied = True
+            deny_reason = stmt_detail["reason"]
+            continue
+        stmt_detail = {
+            "type": stmt_type,
+            "tables": sorted(tables),
+            "ctes": sorted(ctes),
+            "allowed": True,
+            "denied": False,
+            "reason": None,
+        }
+
+        # Only check real tables (not CTE references)
+        real_tables: frozenset[str] = stmt.get("real_tables", frozenset())
+        stmt_type_lc = stmt_type.lower()
+
+        # Check deny first (deny takes precedence). Action keys are already
+        # lower-cased, so only deny.all and deny.<type> can apply, and both
+        # are checked at once against their union. The set operations run the
+        # whole table list through the hash set in C; the matching rule and
+        # table are only looked up once a statement is known to fail, starting
+        # with the blanket deny.all rule.
+        if not deny_any.get(stmt_type_lc, deny_all_norm).isdisjoint(real_tables):
+            for deny_action in ("all", stmt_type_lc):
+                deny_tables_normalized = deny_norm.get(deny_action)
+                if deny_tables_normalized and not deny_tables_normalized.isdisjoint(
+                    real_tables
+                ):
+                    table = min(deny_tables_normalized.intersection(real_tables))
+                    stmt_detail["allowed"] = False
+                    stmt_detail["denied"] = True
+                    stmt_detail["reason"] = (
+                        f"Denied by deny.{deny_action} for table {table}"
+                    )
+                    denied = True
+                    deny_reason = stmt_detail["reason"]
+                    # One matching rule is enough to deny the statement
+                    break
+        # Only check allow if not denied
+        if not stmt_detail["denied"]:
+            allowed_tables_normalized = allow_norm.get(stmt_type_lc, allow_all_norm)
+            if not allowed_tables_normalized.issuperset(real_tables):
+                table = min(real_tables.difference(allowed_tables_normalized))
+                stmt_detail["allowed"] = False
+                stmt_detail["reason"] = f"Table {table} not allowed for {stmt_type}"
+                denied = True
+                deny_reason = stmt_detail["reason"]
+        details.append(stmt_detail)
+
+    return {
+        "allowed": not denied,
+        "details": details,
+        "reason": deny_reason if denied else "All statements allowed",
+    }